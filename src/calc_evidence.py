@@ -4,9 +4,13 @@ __author__ = "jgru"
 __version__ = "0.0.1"
 
 import argparse
+import os
 import sys
 
+from evidence_set_calculation.distributed import *
+from evidence_set_calculation.incremental import *
 from evidence_set_calculation.smv_based_evidence import *
+from evidence_set_calculation.symmetry import *
 from evidence_set_calculation.utils import *
 
 
@@ -19,7 +23,12 @@ def main():
     """
     args = parse_args()
 
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
     model_data = None
+    previous = None
 
     # Checks, if stdin should be read
     if sys.stdin.isatty():
@@ -31,10 +40,58 @@ def main():
     else:
         model_data = sys.stdin.read()
 
-    with NuSMVEvidenceProcessor(model_data) as ep:
-        es = ep.calc_set(
-            EvidenceType.normalize(args.etype), [args.action]
-        )
+    if args.listen:
+        with Coordinator(
+            model_data, *args.listen, timeout=args.timeout
+        ) as c:
+            es = c.calc_set(
+                EvidenceType.normalize(args.etype), [args.action], args.deadline
+            )
+    else:
+        with NuSMVEvidenceProcessor(model_data) as ep:
+            symmetries = None
+            if args.symmetry:
+                symmetries = Symmetries.detect(ep.parsed_model, ep.ACTION_NAME)
+
+            if args.incremental and os.path.exists(args.incremental):
+                with open(args.incremental, "r") as f:
+                    previous = load_run(f)
+                es = calc_set_incremental(
+                    ep,
+                    EvidenceType.normalize(args.etype),
+                    previous,
+                    [args.action],
+                    symmetries=symmetries,
+                )
+            else:
+                es = ep.calc_set(
+                    EvidenceType.normalize(args.etype),
+                    [args.action],
+                    symmetries=symmetries,
+                )
+
+    if args.incremental:
+        stored = es
+        # A run restricted to a single action must not replace the
+        # stored run, but complete it
+        if args.action and previous is not None:
+            stored = merge_run(previous, model_data, args.etype, es)
+
+        if stored is None:
+            print(
+                f"Not storing the partial run, since {args.incremental} "
+                "belongs to another model or type",
+                file=sys.stderr,
+            )
+        else:
+            with open(args.incremental, "w") as f:
+                store_run(f, model_data, args.etype, stored)
+
+    if args.output_file:
+        mode = "wb" if args.output_format == EvidenceFormat.binary.value else "w"
+        with open(args.output_file, mode) as f:
+            output_evidence_set(es, args.etype, args.output_format, f)
+    else:
         output_evidence_set(es, args.etype, args.output_format)
 
 
@@ -63,9 +120,63 @@ def parse_args():
         choices=[
             EvidenceFormat.csv.value,
             EvidenceFormat.raw.value,
+            EvidenceFormat.jsonl.value,
+            EvidenceFormat.binary.value,
         ],
         help="Output format of the calculated sets",
     )
+    parser.add_argument(
+        "-f",
+        "--output-file",
+        required=False,
+        help="File to write the calculated sets to. " \
+             "Write to STDOUT if not specified",
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        required=False,
+        metavar="RUN",
+        help="File to store the run in. If it exists, only the evidence " \
+             "affected by changes to the model stored therein is recalculated",
+    )
+    parser.add_argument(
+        "-s",
+        "--symmetry",
+        action="store_true",
+        help="Exploit symmetries of the model to reduce the number of checks",
+    )
+    parser.add_argument(
+        "-l",
+        "--listen",
+        required=False,
+        metavar="HOST:PORT",
+        help="Distribute the calculation among workers connecting to " \
+             "the given address",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=600.0,
+        metavar="SECONDS",
+        help="Time a worker may take for a single work unit, before the " \
+             "unit is re-issued to another worker (also the time to wait " \
+             "for the first worker)",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        required=False,
+        metavar="SECONDS",
+        help="Abort the distributed calculation after the given time",
+    )
+    parser.add_argument(
+        "-w",
+        "--worker",
+        required=False,
+        metavar="HOST:PORT",
+        help="Run as worker for the coordinator at the given address",
+    )
     parser.add_argument(
         "model",
         nargs="?",
@@ -76,6 +187,19 @@ def parse_args():
     )
     args = parser.parse_args()
 
+    for option in ["listen", "worker"]:
+        address = getattr(args, option)
+        if address:
+            try:
+                setattr(args, option, parse_address(address))
+            except ValueError as e:
+                parser.error(f"--{option}: {e}")
+
+    if args.listen and args.symmetry:
+        parser.error("-s/--symmetry is not supported with -l/--listen")
+    if args.listen and args.incremental:
+        parser.error("-i/--incremental is not supported with -l/--listen")
+
     return args
 
 
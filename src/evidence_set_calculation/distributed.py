@@ -0,0 +1,394 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+
+__author__ = "jgru"
+__version__ = "0.0.1"
+
+import json
+import math
+import queue
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from functools import partial
+from itertools import combinations, count, islice
+from typing import TextIO, Union
+
+import pynusmv as pn
+
+from .smv_based_evidence import EvidenceType, NuSMVEvidenceProcessor
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7878
+
+# Seconds after which the coordinator reports that no worker connected yet
+CONNECT_WARNING = 10.0
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    """Splits an address of the form host:port. IPv6 addresses are
+    enclosed in brackets, e.g., [::1]:7878. If the host is omitted,
+    DEFAULT_HOST is used, if the port is omitted, DEFAULT_PORT.
+
+    """
+    if address.startswith("["):
+        host, bracket, rest = address[1:].partition("]")
+        if not bracket or rest and not rest.startswith(":"):
+            raise ValueError(f"Malformed address {address}")
+        port = rest[1:]
+    elif address.count(":") > 1:
+        # Bare IPv6 address without port
+        host, port = address, ""
+    else:
+        host, _, port = address.partition(":")
+
+    if not port:
+        port = DEFAULT_PORT
+    elif port.isdigit():
+        port = int(port)
+    else:
+        raise ValueError(f"Invalid port {port}")
+
+    if not 0 <= port <= 65535:
+        raise ValueError(f"Port {port} is out of range")
+
+    return host or DEFAULT_HOST, port
+
+
+def send_message(f: TextIO, msg: dict) -> None:
+    """Sends a message as a single line of JSON."""
+    f.write(json.dumps(msg) + "\n")
+    f.flush()
+
+
+def receive_message(f: TextIO) -> Union[dict, None]:
+    """Receives a message, which was sent via send_message().
+
+    Returns the message or None, if the peer closed the connection.
+    """
+    line = f.readline()
+
+    if not line:
+        return None
+
+    return json.loads(line)
+
+
+class Coordinator:
+    """Distributes the calculation of evidence sets among workers,
+    which connect via TCP (see run_worker()).
+
+    The protocol consists of newline-delimited JSON messages. On
+    connect, the coordinator sends the model to the worker
+    ({"op": "setup", "model": ...}). Afterwards, work units are sent
+    one at a time ({"op": "unit", "id": ..., ...}), each answered by
+    the worker with the found evidence ({"id": ..., "hits": [...]}).
+    Finally, the coordinator sends {"op": "quit"}.
+
+    A worker, which does not answer a unit in time or closes the
+    connection, is dropped and the unit is re-issued to another worker
+    up to max_retries times.
+
+    """
+
+    def __init__(
+        self,
+        model: str,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        chunk_size: int = 8,
+        timeout: float = 600.0,
+        max_retries: int = 3,
+    ) -> None:
+        """Initializes the coordinator. The model is parsed only,
+        since the model checking itself is solely done by the workers.
+
+        chunk_size determines the number of variable combinations per
+        work unit, timeout the number of seconds after which a worker
+        not answering a unit is considered dead (as well as the time to
+        wait for the first worker) and max_retries how often a unit is
+        re-issued before the calculation fails.
+
+        """
+        self.model_data = model
+        self.ep = NuSMVEvidenceProcessor(model)
+        self.address = (host, port)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.ids = count()
+        self.attempts = Counter()
+        self.units = queue.Queue()
+        self.done = queue.Queue()
+        self.handlers = []
+        self.started = time.monotonic()
+        self.warned = False
+
+    def __enter__(self) -> Coordinator:
+        """
+        Establishes a context manager and starts to accept workers.
+        """
+        family = socket.AF_INET6 if ":" in self.address[0] else socket.AF_INET
+        self.server = socket.create_server(self.address, family=family)
+        self.acceptor = threading.Thread(target=self.accept, daemon=True)
+        self.acceptor.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Exits the context manager and dismisses the workers.
+        """
+        self.server.close()
+
+        for _ in self.handlers:
+            self.units.put(None)
+
+    def accept(self) -> None:
+        """Accepts connecting workers and serves each of them in a
+        separate thread.
+
+        """
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                # Server socket was closed
+                return
+
+            handler = threading.Thread(target=self.serve, args=(conn,), daemon=True)
+            handler.start()
+            self.handlers.append(handler)
+
+    def serve(self, conn: socket.socket) -> None:
+        """Hands out work units to a single worker. If the worker
+        dies or exceeds the timeout, the unit it was working on is put
+        back into the queue to be re-issued to another worker. A unit,
+        which failed max_retries times, is reported as failed instead.
+
+        """
+        conn.settimeout(self.timeout)
+
+        with conn, conn.makefile("rw") as f:
+            try:
+                send_message(f, {"op": "setup", "model": self.model_data})
+            except OSError:
+                return
+
+            while True:
+                unit = self.units.get()
+
+                if unit is None:
+                    try:
+                        send_message(f, {"op": "quit"})
+                    except OSError:
+                        pass
+                    return
+
+                try:
+                    send_message(f, unit)
+                    reply = receive_message(f)
+                    if reply is None:
+                        raise ConnectionError("Worker closed the connection")
+                except (OSError, ValueError) as e:
+                    self.attempts[unit["id"]] += 1
+
+                    if self.attempts[unit["id"]] > self.max_retries:
+                        self.done.put({"id": unit["id"], "error": str(e)})
+                    else:
+                        print(f"Re-issuing unit {unit['id']}: {e}", file=sys.stderr)
+                        self.units.put(unit)
+                    return
+
+                self.done.put(reply)
+
+    def calc_set(
+        self,
+        _type: Union[EvidenceType, str],
+        actions: Union[pn.model.Identifier, list[pn.model.Identifier]] = None,
+        timeout: float = None,
+    ) -> dict[str, dict[pn.model.Identifier, pn.model.Identifier]]:
+        """Calculates the requested set of evidence by means of the
+        connected workers. See NuSMVEvidenceProcessor.calc_set() for
+        the parameters, timeout limits the whole calculation to the
+        given number of seconds.
+
+        The powerdict is processed level by level, i.e., all variable
+        combinations of the same size at once. Since combinations of
+        the same size cannot subsume each other, the units of a level
+        are independent of each other. Each unit carries the evidence
+        found on the lower levels (the subsumption frontier), so that
+        the worker skips the combinations, which are not minimal. This
+        yields the same result as NuSMVEvidenceProcessor.calc_set().
+
+        Raises TimeoutError, if the calculation exceeds the timeout or
+        no worker connects in time (see __init__()), and RuntimeError,
+        if a unit failed too often or all workers, which connected, are
+        gone.
+
+        Returns a dict of dicts where the respective action is used as key
+        for the respective dict of evidence.
+
+        """
+        self.started = time.monotonic()
+        deadline = self.started + timeout if timeout is not None else None
+        _type = EvidenceType.normalize(_type)
+        actions = self.ep.sanitize_actions(actions)
+        _vars = self.ep.get_model_vars()
+
+        frontier = {str(action): [] for action in actions}
+        results = {str(action): [] for action in actions}
+
+        for level in range(1, len(_vars) + 1):
+            units = []
+            size = math.comb(len(_vars), level)
+
+            for action in actions:
+                for start in range(0, size, self.chunk_size):
+                    units.append(
+                        {
+                            "op": "unit",
+                            "id": next(self.ids),
+                            "type": _type.value,
+                            "actions": [str(a) for a in actions],
+                            "action": str(action),
+                            "level": level,
+                            "start": start,
+                            "stop": min(start + self.chunk_size, size),
+                            "frontier": frontier[str(action)],
+                        }
+                    )
+
+            for unit in units:
+                self.units.put(unit)
+
+            # Wait for the whole level, before the frontier is extended
+            hits = {}
+            while len(hits) < len(units):
+                reply = self.wait(deadline)
+                if "error" in reply:
+                    raise RuntimeError(
+                        f"Unit {reply['id']} failed {self.attempts[reply['id']]} "
+                        f"times: {reply['error']}"
+                    )
+                hits[reply["id"]] = reply["hits"]
+
+            # Merge in the order of the units to retain the order of
+            # the sequential calculation
+            for unit in units:
+                for e in hits[unit["id"]]:
+                    d = {v: t for v, t in _vars.items() if str(v) in e}
+                    frontier[unit["action"]].append(list(e.keys()))
+                    results[unit["action"]].extend(self.ep.restore_evidence([e], d))
+
+        return results
+
+    def wait(self, deadline: float = None, poll: float = 1.0) -> dict:
+        """Waits for the next reply of a worker until the deadline (in
+        terms of time.monotonic()) is reached.
+
+        Returns the reply.
+        """
+        while True:
+            try:
+                return self.done.get(timeout=poll)
+            except queue.Empty:
+                pass
+
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Distributed calculation exceeded its timeout")
+
+            if self.handlers and not any(h.is_alive() for h in self.handlers):
+                raise RuntimeError("All workers are gone")
+
+            if not self.handlers:
+                waited = time.monotonic() - self.started
+                if self.timeout is not None and waited > self.timeout:
+                    raise TimeoutError(
+                        f"No worker connected within {self.timeout} seconds"
+                    )
+                if waited > CONNECT_WARNING and not self.warned:
+                    host, port = self.server.getsockname()[:2]
+                    print(f"Waiting for workers on {host}:{port}", file=sys.stderr)
+                    self.warned = True
+
+
+def process_unit(
+    ep: NuSMVEvidenceProcessor,
+    _vars: dict[pn.model.Identifier, pn.model.SimpleType],
+    unit: dict,
+) -> list[dict[str, str]]:
+    """Checks the slice of variable combinations specified by the
+    work unit.
+
+    Returns the stringified evidence found.
+    """
+    _type = EvidenceType.normalize(unit["type"])
+    check_func = ep.evidence_type_to_func(_type)
+
+    if _type == EvidenceType.action_induced:
+        check_func = partial(
+            check_func, [pn.model.Identifier(a) for a in unit["actions"]]
+        )
+
+    action = pn.model.Identifier(unit["action"])
+    frontier = [set(h) for h in unit["frontier"]]
+    hits = []
+
+    for subset in islice(
+        combinations(_vars.items(), unit["level"]), unit["start"], unit["stop"]
+    ):
+        d = dict(subset)
+
+        # Skip combinations, which are subsumed by evidence
+        # found on a lower level
+        if any(h <= {str(v) for v in d} for h in frontier):
+            continue
+
+        for c in ep.check_combos(check_func, action, d):
+            hits.append({str(var): str(val) for var, val in c.items()})
+
+    return hits
+
+
+def run_worker(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    retries: int = 10,
+    delay: float = 1.0,
+) -> None:
+    """Connects to a coordinator, loads the model received from it
+    and processes work units until the coordinator sends quit.
+
+    """
+    for attempt in range(retries):
+        try:
+            sock = socket.create_connection((host, port))
+            break
+        except OSError as e:
+            if attempt == retries - 1:
+                raise e
+            time.sleep(delay)
+
+    with sock, sock.makefile("rw") as f:
+        msg = receive_message(f)
+
+        if msg is None or msg["op"] != "setup":
+            return
+
+        with NuSMVEvidenceProcessor(msg["model"]) as ep:
+            _vars = ep.get_model_vars()
+
+            while True:
+                msg = receive_message(f)
+
+                if msg is None or msg["op"] == "quit":
+                    return
+
+                send_message(
+                    f, {"id": msg["id"], "hits": process_unit(ep, _vars, msg)}
+                )
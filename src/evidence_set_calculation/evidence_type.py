@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+
+__author__ = "jgru"
+__version__ = "0.0.1"
+
+from enum import Enum
+from typing import Union
+
+
+class EvidenceType(Enum):
+    """Defines the classes of evidence
+
+    necessary: X(G(A_i -> E))
+    sufficient: X (A_i) V !E
+    action-induced: X (G ((A_i -> E) & Y (E -> O A_i)))
+
+    """
+
+    necessary = "necessary"
+    sufficient = "sufficient"
+    action_induced = "action-induced"
+
+    def __str__(self) -> str:
+        return str.__str__(self)
+
+    def normalize(_type: Union[Enum, str]) -> EvidenceType:
+        """
+        Ensures that _type is converted to an EvidenceType-object
+        if necessary.
+
+        Returns the corresponding EvidenceType
+        """
+        if isinstance(_type, EvidenceType):
+            return _type
+        else:
+            if _type == EvidenceType.necessary.value:
+                return EvidenceType.necessary
+            elif _type == EvidenceType.sufficient.value:
+                return EvidenceType.sufficient
+            elif _type == EvidenceType.action_induced.value:
+                return EvidenceType.action_induced
+            else:
+                raise ValueError(f"Can't convert {_type} to EvidenceType")
@@ -0,0 +1,432 @@
+#!/usr/bin/python3
+
+__author__ = "jgru"
+__version__ = "0.0.1"
+
+import argparse
+import contextlib
+import copy
+import io
+import math
+import multiprocessing
+import random
+import sys
+import time
+from collections.abc import Callable
+from functools import partial
+from statistics import mean
+from typing import Union
+
+from .distributed import Coordinator, run_worker
+from .incremental import calc_set_incremental, load_run, store_run
+from .smv_based_evidence import EvidenceType, NuSMVEvidenceProcessor
+from .symmetry import Symmetries
+
+# The action, which is always enabled. This keeps the generated
+# models free of deadlocks.
+IDLE_ACTION = "nop"
+
+
+def random_spec(
+    rng: random.Random, n_vars: int, n_actions: int, n_values: int = 3
+) -> dict:
+    """Generates the specification of a random model.
+
+    Each variable is either a boolean or an enumeration of n_values
+    values. Each action assigns some variables and is guarded by
+    conditions on some variables.
+
+    Returns a dict with the keys actions, vars, init, assigns and guards.
+    """
+    spec = {
+        "actions": [f"a{i}" for i in range(n_actions)],
+        "vars": {},
+        "init": {},
+        "assigns": {},
+        "guards": [],
+    }
+
+    for i in range(n_vars):
+        name = f"v{i}"
+        values = (
+            ["TRUE", "FALSE"]
+            if rng.random() < 0.5
+            else [f"s{j}" for j in range(n_values)]
+        )
+        spec["vars"][name] = values
+        spec["init"][name] = values[-1]
+        spec["assigns"][name] = [
+            (action, rng.choice(values))
+            for action in spec["actions"]
+            if rng.random() < 0.4
+        ]
+
+    for action in spec["actions"]:
+        if rng.random() < 0.5:
+            var = rng.choice(list(spec["vars"]))
+            spec["guards"].append((action, var, rng.choice(spec["vars"][var])))
+
+    return spec
+
+
+def mirror_spec(spec: dict) -> dict:
+    """Doubles the specification by adding a renamed copy of each
+    variable and action, which is updated in the same way. The
+    resulting model is symmetric under swapping the copies.
+
+    """
+
+    def twin(name):
+        return f"{name}_b"
+
+    mirrored = copy.deepcopy(spec)
+
+    mirrored["actions"] += [twin(a) for a in spec["actions"]]
+
+    for var, values in spec["vars"].items():
+        mirrored["vars"][twin(var)] = values
+        mirrored["init"][twin(var)] = spec["init"][var]
+        mirrored["assigns"][twin(var)] = [
+            (twin(action), val) for action, val in spec["assigns"][var]
+        ]
+
+    mirrored["guards"] += [
+        (twin(action), twin(var), val) for action, var, val in spec["guards"]
+    ]
+
+    return mirrored
+
+
+def mutate_spec(rng: random.Random, spec: dict) -> dict:
+    """Changes a single assignment or guard of the specification, like
+    a modeller editing one case of an ASSIGN-section or one TRANS.
+
+    """
+    mutated = copy.deepcopy(spec)
+
+    if rng.random() < 0.5:
+        guards = mutated["guards"]
+
+        if guards and rng.random() < 0.5:
+            i = rng.randrange(len(guards))
+            action, var, val = guards[i]
+            values = mutated["vars"][var]
+            guards[i] = (action, var, rng.choice([v for v in values if v != val]))
+        else:
+            var = rng.choice(list(mutated["vars"]))
+            guards.append(
+                (
+                    rng.choice(mutated["actions"]),
+                    var,
+                    rng.choice(mutated["vars"][var]),
+                )
+            )
+
+        return mutated
+
+    var = rng.choice(list(mutated["vars"]))
+    values = mutated["vars"][var]
+    branches = mutated["assigns"][var]
+
+    if branches and rng.random() < 0.5:
+        i = rng.randrange(len(branches))
+        action, val = branches[i]
+        branches[i] = (action, rng.choice([v for v in values if v != val]))
+    else:
+        branches.append((rng.choice(mutated["actions"]), rng.choice(values)))
+
+    return mutated
+
+
+def render_model(spec: dict) -> str:
+    """Renders the specification in NuSMV's input language."""
+    actions = [IDLE_ACTION] + spec["actions"]
+    lines = ["MODULE main", "    VAR"]
+    lines.append(f"        action: {{{', '.join(actions)}}};")
+
+    for var, values in spec["vars"].items():
+        _type = "boolean" if values == ["TRUE", "FALSE"] else f"{{{', '.join(values)}}}"
+        lines.append(f"        {var}: {_type};")
+
+    lines += ["    INIT", f"        action = {IDLE_ACTION}"]
+    for var, val in spec["init"].items():
+        lines += ["    INIT", f"        {var} = {val}"]
+
+    lines.append("    ASSIGN")
+    for var, branches in spec["assigns"].items():
+        lines += [f"        next({var}) :=", "            case"]
+        for action, val in branches:
+            lines.append(f"                next(action) = {action}: {val};")
+        lines += [f"                TRUE: {var};", "            esac;"]
+
+    for action, var, val in spec["guards"]:
+        lines += ["    TRANS", f"        next(action) = {action} -> {var} = {val}"]
+
+    return "\n".join(lines) + "\n"
+
+
+def canonical(
+    results: dict[str, list[dict]]
+) -> dict[str, list[tuple[tuple[str, str], ...]]]:
+    """Brings evidence sets into a canonical order for comparison."""
+    return {
+        str(action): sorted(
+            tuple(sorted((str(var), str(val)) for var, val in e.items()))
+            for e in evidence
+        )
+        for action, evidence in results.items()
+    }
+
+
+def run_reference(model: str, _type: EvidenceType) -> dict:
+    """Runs the exhaustive enumeration of calc_set_compound()."""
+    with NuSMVEvidenceProcessor(model) as ep:
+        return ep.calc_set(_type)
+
+
+def reference_engine(
+    rng: random.Random, spec: dict, _type: EvidenceType
+) -> Callable[[], dict]:
+    """Runs the exhaustive enumeration as baseline."""
+    return partial(run_reference, render_model(spec), _type)
+
+
+def symmetry_engine(
+    rng: random.Random, spec: dict, _type: EvidenceType
+) -> Callable[[], dict]:
+    """Detects the symmetries of the model and exploits them."""
+
+    def run():
+        with NuSMVEvidenceProcessor(render_model(spec)) as ep:
+            symmetries = Symmetries.detect(ep.parsed_model, ep.ACTION_NAME)
+            return ep.calc_set(_type, symmetries=symmetries)
+
+    return run
+
+
+def incremental_engine(
+    rng: random.Random, spec: dict, _type: EvidenceType
+) -> Callable[[], dict]:
+    """Calculates the evidence of a model differing in a single
+    assignment beforehand and recalculates it incrementally for the
+    model itself. Only the latter is timed.
+
+    """
+    earlier = render_model(mutate_spec(rng, spec))
+    f = io.StringIO()
+    store_run(f, earlier, _type, run_reference(earlier, _type))
+    f.seek(0)
+    previous = load_run(f)
+
+    def run():
+        with NuSMVEvidenceProcessor(render_model(spec)) as ep:
+            return calc_set_incremental(ep, _type, previous)
+
+    return run
+
+
+def stop_workers(processes: list[multiprocessing.Process], grace: float = 5.0) -> None:
+    """Joins the worker processes and terminates those, which do not
+    exit within the grace period.
+
+    """
+    for p in processes:
+        p.join(grace)
+        if p.is_alive():
+            p.terminate()
+            p.join()
+
+
+def distributed_engine(
+    rng: random.Random,
+    spec: dict,
+    _type: EvidenceType,
+    workers: int = 2,
+    timeout: float = 300.0,
+) -> Callable[[], dict]:
+    """Distributes the calculation among worker processes on
+    localhost. The workers are spawned beforehand and only the
+    calculation after all of them connected is timed (which still
+    includes the workers loading the model into NuSMV).
+
+    The calculation is aborted after timeout seconds. Afterwards, the
+    workers are terminated, if they do not exit on their own.
+
+    """
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+
+    stack = contextlib.ExitStack()
+    stack.callback(stop_workers, processes)
+
+    try:
+        c = stack.enter_context(Coordinator(render_model(spec), port=0))
+        host, port = c.server.getsockname()[:2]
+        processes.extend(
+            ctx.Process(target=run_worker, args=(host, port)) for _ in range(workers)
+        )
+        for p in processes:
+            p.start()
+
+        deadline = time.monotonic() + timeout
+        while len(c.handlers) < workers:
+            if time.monotonic() > deadline or not any(p.is_alive() for p in processes):
+                raise TimeoutError("Workers failed to connect")
+            time.sleep(0.05)
+    except BaseException:
+        stack.close()
+        raise
+
+    def run():
+        with stack:
+            return c.calc_set(_type, timeout=timeout)
+
+    return run
+
+
+ENGINES = {
+    "symmetry": symmetry_engine,
+    "incremental": incremental_engine,
+    "distributed": distributed_engine,
+}
+
+
+def compare(
+    sizes: list[int],
+    models: int = 5,
+    n_actions: int = 3,
+    _type: Union[EvidenceType, str] = EvidenceType.sufficient,
+    engines: dict[str, Callable] = ENGINES,
+    seed: int = 0,
+) -> list[dict]:
+    """Runs the reference and each engine on the same random models
+    and compares the evidence sets after canonical ordering. Every
+    second model is mirrored, so that it contains symmetries.
+
+    An engine raising an exception (e.g., a TimeoutError) is counted
+    as failure on that model, the remaining engines and models are
+    still run.
+
+    Returns a list of dicts, one per size and engine, holding the
+    number of models, the number of mismatches and failures and the
+    mean speedup over the reference.
+    """
+    _type = EvidenceType.normalize(_type)
+    rng = random.Random(seed)
+    report = []
+
+    for size in sizes:
+        timings = {name: [] for name in engines}
+        mismatches = {name: 0 for name in engines}
+        failures = {name: 0 for name in engines}
+
+        for i in range(models):
+            if i % 2:
+                spec = mirror_spec(
+                    random_spec(rng, max(size // 2, 1), max(n_actions // 2, 1))
+                )
+            else:
+                spec = random_spec(rng, size, n_actions)
+
+            start = time.perf_counter()
+            expected = canonical(reference_engine(rng, spec, _type)())
+            reference_time = time.perf_counter() - start
+
+            for name, engine in engines.items():
+                try:
+                    run = engine(rng, spec, _type)
+
+                    start = time.perf_counter()
+                    actual = canonical(run())
+                    elapsed = time.perf_counter() - start
+                except Exception as e:
+                    failures[name] += 1
+                    print(
+                        f"Failure of {name} ({e!r}) on model:\n{render_model(spec)}",
+                        file=sys.stderr,
+                    )
+                    continue
+
+                timings[name].append(reference_time / elapsed)
+
+                if actual != expected:
+                    mismatches[name] += 1
+                    print(
+                        f"Mismatch of {name} on model:\n{render_model(spec)}",
+                        file=sys.stderr,
+                    )
+
+        for name in engines:
+            report.append(
+                {
+                    "size": size,
+                    "engine": name,
+                    "models": models,
+                    "mismatches": mismatches[name],
+                    "failures": failures[name],
+                    "speedup": mean(timings[name]) if timings[name] else math.nan,
+                }
+            )
+
+    return report
+
+
+def main():
+    """Entry point of the harness. Prints one line per size and engine
+    and exits with 1, if any engine deviates from the reference or
+    fails.
+
+    """
+    parser = argparse.ArgumentParser(
+        description="Compares alternative engines against the exhaustive "
+        "calculation of evidence sets on random models"
+    )
+    parser.add_argument(
+        "-s", "--sizes", type=int, nargs="+", default=[2, 3, 4],
+        help="Numbers of variables of the generated models",
+    )
+    parser.add_argument(
+        "-n", "--models", type=int, default=5, help="Number of models per size"
+    )
+    parser.add_argument(
+        "-a", "--actions", type=int, default=3, help="Number of actions per model"
+    )
+    parser.add_argument(
+        "-t",
+        "--etype",
+        default=EvidenceType.sufficient.value,
+        choices=[EvidenceType.sufficient.value, EvidenceType.necessary.value],
+        help="Type of evidence to calculate",
+    )
+    parser.add_argument(
+        "-e", "--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES),
+        help="Engines to compare against the reference",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the models")
+    args = parser.parse_args()
+
+    report = compare(
+        args.sizes,
+        args.models,
+        args.actions,
+        args.etype,
+        {name: ENGINES[name] for name in args.engines},
+        args.seed,
+    )
+
+    print(
+        f"{'size':>5} {'engine':<12} {'models':>6} {'mismatches':>10} "
+        f"{'failures':>8} {'speedup':>8}"
+    )
+    for r in report:
+        print(
+            f"{r['size']:>5} {r['engine']:<12} {r['models']:>6} "
+            f"{r['mismatches']:>10} {r['failures']:>8} {r['speedup']:>8.2f}"
+        )
+
+    if any(r["mismatches"] or r["failures"] for r in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+#!/usr/bin/python3
+
+__author__ = "jgru"
+__version__ = "0.0.1"
+
+import json
+import re
+from collections import Counter
+from functools import partial
+from typing import Optional, TextIO, Union
+
+import pynusmv as pn
+
+from .sections import (
+    CONSTRAINT_SECTIONS,
+    IDENTIFIER,
+    MAPPING_SECTIONS,
+    PATH_SECTIONS,
+)
+from .smv_based_evidence import EvidenceType, NuSMVEvidenceProcessor
+from .symmetry import Symmetries
+
+
+def store_run(
+    fp: TextIO,
+    model_data: str,
+    _type: Union[EvidenceType, str],
+    results: dict[str, list[dict[pn.model.Identifier, pn.model.SimpleType]]],
+) -> None:
+    """Stores the model and the calculated evidence sets as JSON, so
+    that a later run can be based upon it.
+
+    """
+    run = {
+        "type": EvidenceType.normalize(_type).value,
+        "model": model_data,
+        "results": {
+            str(action): [
+                {str(var): str(val) for var, val in e.items()} for e in evidence
+            ]
+            for action, evidence in results.items()
+        },
+    }
+    json.dump(run, fp)
+
+
+def load_run(fp: TextIO) -> dict:
+    """Loads a run, which was stored via store_run().
+
+    Returns a dict with the keys type, model and results.
+    """
+    run = json.load(fp)
+
+    for key in ["type", "model", "results"]:
+        if key not in run:
+            raise ValueError(f"Stored run lacks the entry {key}")
+
+    return run
+
+
+def referenced_names(expr, names: set[str]) -> set[str]:
+    """Retrieves the names of variables and defines, which are used
+    within the given expression.
+
+    """
+    return set(IDENTIFIER.findall(str(expr))) & names
+
+
+def section_elements(parsed_model, section: str) -> Union[dict, Counter]:
+    """Retrieves the elements of a section in comparable form.
+
+    Mapping sections are returned as dict of stringified keys and
+    values, constraint sections as multiset of stringified constraints.
+
+    """
+    body = getattr(parsed_model, section)
+
+    if section in MAPPING_SECTIONS:
+        return {str(k): str(v) for k, v in body.items()}
+    return Counter(str(e) for e in body)
+
+
+def action_node(action: Union[pn.model.Identifier, str]) -> str:
+    """Names the node of the dependency graph representing a single
+    action. Since "=" cannot be part of an identifier, it does not
+    clash with variables or defines.
+
+    """
+    return f"={action}"
+
+
+def referenced_nodes(
+    expr, names: set[str], actions: set[str], action_name: str
+) -> set[str]:
+    """Retrieves the nodes of the dependency graph, which are used
+    within the given expression.
+
+    Each use of the action variable in the form next(action) = X is
+    resolved to the node of action X. If the action variable is used
+    in any other way, the expression depends on all actions.
+
+    """
+    string = str(expr)
+    tokens = IDENTIFIER.findall(string)
+    nodes = set(tokens) & names
+
+    uses = tokens.count(action_name)
+    guards = re.findall(
+        rf"next\({re.escape(action_name)}\)\s*=\s*({IDENTIFIER.pattern})", string
+    )
+
+    if not uses:
+        return nodes
+    if uses == len(guards):
+        return nodes | {action_node(a) for a in guards}
+    return nodes | {action_node(a) for a in actions}
+
+
+def guarded_action(constraint, action_name: str) -> Union[tuple[str, str], None]:
+    """Splits a constraint of the form next(action) = X -> body, which
+    only restricts when action X can be taken.
+
+    *Note:* pynusmv's parser builds a -> b as Implies(b, a), hence the
+    guard is the right operand of the parsed implication.
+
+    Returns X and the body or None, if the constraint is not of this
+    form or constrains the next state itself.
+    """
+    if not isinstance(constraint, pn.model.Implies):
+        return None
+
+    m = re.fullmatch(
+        rf"\s*next\({re.escape(action_name)}\)\s*=\s*({IDENTIFIER.pattern})\s*",
+        str(constraint.right),
+    )
+    body = str(constraint.left)
+
+    if m is None or "next(" in body:
+        return None
+
+    return m.group(1), body
+
+
+def model_names(parsed_model, action_name: str = None) -> set[str]:
+    """Retrieves the names of all variables and defines of the model
+    except the variable encoding the action.
+
+    """
+    return {
+        str(name)
+        for section in ["VAR", "IVAR", "FROZENVAR", "DEFINE"]
+        for name in getattr(parsed_model, section).keys()
+    } - {action_name}
+
+
+def model_actions(parsed_model, action_name: str) -> set[str]:
+    """Retrieves the values of the variable encoding the action."""
+    _type = parsed_model.VAR.get(pn.model.Identifier(action_name))
+
+    return {str(a) for a in _type.values} if _type is not None else set()
+
+
+def dependency_graph(parsed_model, action_name: str) -> dict[str, set[str]]:
+    """Constructs the graph of dependencies between variables, defines
+    and actions.
+
+    An assignment makes the assigned variable depend on each name used
+    in its right-hand side (including the actions in the guards of the
+    cases), a define depends on each name used in its body. A
+    constraint next(action) = X -> body makes action X depend on the
+    names in the body, since it determines when X can be taken. Other
+    constraints (INIT, INVAR, TRANS) do not have a direction, hence
+    all names occurring in them depend on each other. An INIT solely
+    fixing the initial action is ignored.
+
+    Returns a dict mapping each node to the nodes it depends on.
+    """
+    names = model_names(parsed_model, action_name)
+    actions = model_actions(parsed_model, action_name)
+    refs = partial(
+        referenced_nodes, names=names, actions=actions, action_name=action_name
+    )
+
+    deps = {node: set() for node in names | {action_node(a) for a in actions}}
+
+    for name, body in parsed_model.DEFINE.items():
+        deps[str(name)] |= refs(body)
+
+    for target, body in parsed_model.ASSIGN.items():
+        for name in referenced_names(target, names):
+            deps[name] |= refs(body)
+
+    for section in CONSTRAINT_SECTIONS:
+        for constraint in getattr(parsed_model, section):
+            guard = guarded_action(constraint, action_name)
+
+            if section == "TRANS" and guard is not None:
+                action, body = guard
+                deps.setdefault(action_node(action), set()).update(refs(body))
+                continue
+
+            coupled = refs(constraint)
+            if section == "INIT" and not coupled & names:
+                continue
+
+            for node in coupled:
+                deps.setdefault(node, set()).update(coupled)
+
+    return deps
+
+
+def idle_actions(deps: dict[str, set[str]], actions: set[str]) -> set[str]:
+    """Retrieves the actions, which can always be taken and which are
+    not used by any assignment or define, i.e., update each variable
+    like the default case.
+
+    """
+    used = set().union(*deps.values())
+
+    return {
+        a
+        for a in actions
+        if not deps[action_node(a)] and action_node(a) not in used
+    }
+
+
+def changed_nodes(old_model, new_model, action_name: str) -> Union[set[str], None]:
+    """Diffs the sections of two parsed models and determines the
+    nodes of the dependency graph, which are directly touched by the
+    modification.
+
+    Returns the set of touched nodes or None, if the modification
+    affects the model as a whole.
+    """
+    names = model_names(old_model, action_name) | model_names(new_model, action_name)
+    actions = model_actions(new_model, action_name)
+    refs = partial(
+        referenced_nodes, names=names, actions=actions, action_name=action_name
+    )
+    changed = set()
+
+    for section in PATH_SECTIONS:
+        if section_elements(old_model, section) != section_elements(
+            new_model, section
+        ):
+            return None
+
+    for section in MAPPING_SECTIONS:
+        old = section_elements(old_model, section)
+        new = section_elements(new_model, section)
+
+        for key in old.keys() | new.keys():
+            if old.get(key) == new.get(key):
+                continue
+            # A modified set of actions affects everything
+            if key == action_name:
+                return None
+            # Declarations and defines are their own target,
+            # assignments target the variable on their left-hand side
+            if section == "ASSIGN":
+                changed |= referenced_names(key, names)
+            else:
+                changed.add(key)
+
+    for section in CONSTRAINT_SECTIONS:
+        old = section_elements(old_model, section)
+        new = section_elements(new_model, section)
+        # The parsed constraints are needed to recognize guards
+        parsed = {
+            str(c): c
+            for model in [old_model, new_model]
+            for c in getattr(model, section)
+        }
+
+        for constraint in (old - new) + (new - old):
+            guard = guarded_action(parsed[constraint], action_name)
+            touched = refs(constraint)
+
+            if section == "TRANS" and guard is not None:
+                # Only alters when the guarded action can be taken
+                changed.add(action_node(guard[0]))
+            elif section == "INIT" and touched and not touched & names:
+                # The initial action was modified
+                return None
+            else:
+                changed |= touched
+
+    return changed
+
+
+def affected_by_changes(
+    old_model, new_model, action_name: str = "action"
+) -> tuple[set[str], set[str]]:
+    """Determines the variables and actions, whose behaviour might
+    differ between the two given parsed models.
+
+    Starting from the directly touched nodes, every node which
+    (transitively) depends on them is considered to be affected as
+    well. The remaining variables and actions are closed under the
+    dependency relation. If there is an idle action among them, which
+    can always be taken and updates every variable like the default
+    case, each step of an affected action can be replaced by a step
+    of the idle action without changing the unaffected variables. The
+    projection of both models onto the unaffected variables and
+    actions is thus identical modulo such replacements, which do not
+    alter whether a formula referring to a single unaffected action
+    holds. Hence, the evidence of an unaffected action consisting
+    solely of unaffected variables can be reused. Without an idle
+    action, all actions are considered to be affected.
+
+    *Note:* This assumes deadlock-free models, since a deadlock
+    induced by a modified constraint would cut off paths regardless of
+    the variables it refers to.
+
+    Returns a set of variable names and a set of action names.
+    """
+    _vars = {
+        str(v)
+        for model in [old_model, new_model]
+        for section in ["VAR", "IVAR", "FROZENVAR"]
+        for v in getattr(model, section).keys()
+    } - {action_name}
+    actions = model_actions(new_model, action_name)
+    changed = changed_nodes(old_model, new_model, action_name)
+
+    if changed is None:
+        return _vars, actions
+
+    deps = dependency_graph(new_model, action_name)
+
+    # Propagate the modification along the reversed dependencies
+    affected = set(changed)
+    frontier = list(changed)
+
+    while frontier:
+        node = frontier.pop()
+        for dependant, dependencies in deps.items():
+            if node in dependencies and dependant not in affected:
+                affected.add(dependant)
+                frontier.append(dependant)
+
+    affected_actions = {a for a in actions if action_node(a) in affected}
+
+    if affected_actions and not idle_actions(deps, actions) - affected_actions:
+        affected_actions = actions
+
+    return affected & _vars, affected_actions
+
+
+def calc_set_incremental(
+    ep: NuSMVEvidenceProcessor,
+    _type: Union[EvidenceType, str],
+    previous: dict,
+    actions: Union[pn.model.Identifier, list[pn.model.Identifier]] = None,
+    symmetries: Optional[Symmetries] = None,
+) -> dict[str, dict[pn.model.Identifier, pn.model.Identifier]]:
+    """Calculates the requested set of evidence based on an earlier
+    run (see load_run()).
+
+    The model of the earlier run is diffed against the model of the
+    processor (see affected_by_changes()). The evidence of affected
+    actions is recalculated completely. For the other actions, only
+    combinations involving affected variables are checked again, the
+    remaining evidence is taken over from the earlier run. If the
+    earlier run used another type of evidence, everything is
+    recalculated, as is the action-induced evidence of all actions
+    once any action is affected, since its formula refers to all
+    actions.
+
+    Returns a dict of dicts where the respective action is used as key
+    for the respective dict of evidence.
+
+    """
+    _type = EvidenceType.normalize(_type)
+
+    if previous["type"] != _type.value:
+        return ep.calc_set(_type, actions, symmetries=symmetries)
+
+    old_model = pn.parser.parseAllString(pn.parser.module, previous["model"])
+    affected_vars, affected_actions = affected_by_changes(
+        old_model, ep.parsed_model, ep.ACTION_NAME
+    )
+
+    if _type == EvidenceType.action_induced and affected_actions:
+        return ep.calc_set(_type, actions, symmetries=symmetries)
+
+    reusable = {
+        action: evidence
+        for action, evidence in previous["results"].items()
+        if action not in affected_actions
+    }
+
+    return ep.calc_set(
+        _type,
+        actions,
+        previous=reusable,
+        affected=affected_vars,
+        symmetries=symmetries,
+    )
+
+
+def merge_run(
+    previous: dict,
+    model_data: str,
+    _type: Union[EvidenceType, str],
+    results: dict[str, list[dict[pn.model.Identifier, pn.model.SimpleType]]],
+) -> Union[dict, None]:
+    """Merges the results of a run restricted to some actions into an
+    earlier run of the same model and type.
+
+    Returns the merged results or None, if the earlier run belongs to
+    another model or type and can therefore not be completed.
+    """
+    if (
+        previous["model"] != model_data
+        or previous["type"] != EvidenceType.normalize(_type).value
+    ):
+        return None
+
+    merged = dict(previous["results"])
+    merged.update(
+        {
+            str(action): [
+                {str(var): str(val) for var, val in e.items()} for e in evidence
+            ]
+            for action, evidence in results.items()
+        }
+    )
+
+    return merged
@@ -0,0 +1,21 @@
+#!/usr/bin/python3
+
+__author__ = "jgru"
+__version__ = "0.0.1"
+
+import re
+
+# Sections, which map a name (or an assignment target) to an expression
+MAPPING_SECTIONS = ["VAR", "IVAR", "FROZENVAR", "DEFINE", "ASSIGN"]
+
+# Sections, which consist of a list of constraints
+CONSTRAINT_SECTIONS = ["INIT", "INVAR", "TRANS"]
+
+# Sections, which restrict the considered paths as a whole. A change
+# in there can affect every evidence set.
+PATH_SECTIONS = ["FAIRNESS", "JUSTICE", "COMPASSION"]
+
+# Matches the identifiers within the string representation of an
+# expression. Keywords (e.g., next, case, TRUE) are matched as well,
+# but are filtered out by intersecting with the model's names.
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_$#]*")
@@ -3,49 +3,15 @@ from __future__ import annotations
 import copy
 import sys
 from collections.abc import Callable
-from enum import Enum
 from functools import partial, reduce
 from itertools import chain, combinations, product
 from operator import iconcat
-from typing import OrderedDict, Union
+from typing import Optional, OrderedDict, Union
 
 import pynusmv as pn
 
-
-class EvidenceType(Enum):
-    """Defines the classes of evidence
-
-    necessary: X(G(A_i -> E))
-    sufficient: X (A_i) V !E
-    action-induced: X (G ((A_i -> E) & Y (E -> O A_i)))
-
-    """
-
-    necessary = "necessary"
-    sufficient = "sufficient"
-    action_induced = "action-induced"
-
-    def __str__(self) -> str:
-        return str.__str__(self)
-
-    def normalize(_type: Union[Enum, str]) -> EvidenceType:
-        """
-        Ensures that _type is converted to an EvidenceType-object
-        if necessary.
-
-        Returns the corresponding EvidenceType
-        """
-        if isinstance(_type, EvidenceType):
-            return _type
-        else:
-            if _type == EvidenceType.necessary.value:
-                return EvidenceType.necessary
-            elif _type == EvidenceType.sufficient.value:
-                return EvidenceType.sufficient
-            elif _type == EvidenceType.action_induced.value:
-                return EvidenceType.action_induced
-            else:
-                raise ValueError(f"Can't convert {_type} to EvidenceType")
+from .evidence_type import EvidenceType
+from .symmetry import Symmetries
 
 
 class NuSMVEvidenceProcessor:
@@ -172,6 +138,10 @@ class NuSMVEvidenceProcessor:
         self,
         _type: Union[EvidenceType, str],
         actions: Union[pn.model.Identifier, list[pn.model.Identifier]] = None,
+        *,
+        previous: dict[str, list[dict[str, str]]] = None,
+        affected: set[str] = None,
+        symmetries: Optional[Symmetries] = None,
     ) -> dict[str, dict[pn.model.Identifier, pn.model.Identifier]]:
         """Calucates the requested set of evidence.
 
@@ -181,6 +151,12 @@ class NuSMVEvidenceProcessor:
         pn.model.Identifier or a list of those types). If it is [] or
         None, all actions are queried from the model
 
+        previous and affected allow to reuse the results of an earlier
+        run (see calc_set_compound() and incremental.py).
+
+        symmetries (see symmetry.py) allows to exploit symmetries of
+        the model to reduce the number of checks.
+
         Returns a dict of dicts where the respective action is used as key
         for the respective dict of evidence.
 
@@ -194,7 +170,18 @@ class NuSMVEvidenceProcessor:
         if _type == EvidenceType.action_induced:
             check_func = partial(check_func, actions)
 
-        return self.calc_set_compound(check_func, actions)
+            # The formula refers to all given actions, hence only the
+            # symmetries mapping them onto each other preserve it
+            if symmetries:
+                symmetries = symmetries.preserving(actions)
+
+        return self.calc_set_compound(
+            check_func,
+            actions,
+            previous=previous,
+            affected=affected,
+            symmetries=symmetries,
+        )
 
     def calc_set_compound(
         self,
@@ -203,6 +190,10 @@ class NuSMVEvidenceProcessor:
             bool,
         ],
         actions: list[pn.model.Identifier],
+        *,
+        previous: dict[str, list[dict[str, str]]] = None,
+        affected: set[str] = None,
+        symmetries: Optional[Symmetries] = None,
     ):
         """Specialization of the calc_set()-method for the
         calculation of compound traces.
@@ -221,16 +212,53 @@ class NuSMVEvidenceProcessor:
         6. Eventually, store the variable/value-combination, if
            the formula holds
 
+        If the stringified evidence of an earlier run is passed via
+        previous alongside the names of the variables affected by a
+        modification of the model, variable combinations without any
+        affected variable are not checked again. Instead, the earlier
+        evidence over exactly those variables is taken over.
+
+        If symmetries of the model are passed, only the first
+        combination of each orbit under the symmetries fixing the
+        action is checked, the others share its outcome. Likewise, the
+        evidence is only calculated for one action per orbit of
+        actions and mapped onto the other actions afterwards.
+
         Returns a dict of dicts where the respective action is used as key
         for the respective dict of evidence.
         """
         results = {}
         _vars = self.get_model_vars()
+        orbits = symmetries.action_orbits(actions) if symmetries else {}
+        order = self.search_order(_vars)
+        positions = {str(v): i for i, v in enumerate(_vars.keys())}
 
         for action in actions:
+            # Calculated by means of the orbit's representative
+            if str(action) in orbits and orbits[str(action)][0] != str(action):
+                continue
+
             # Collect variable combos to avoid "checking to much"
             hits = []
             result = []
+            status = {}
+            found = {}
+            check = check_func
+            stabilizer = symmetries.stabilizer(action) if symmetries else []
+            if stabilizer:
+                check = partial(
+                    self.check_symmetric,
+                    check_func,
+                    symmetries.descend,
+                    stabilizer,
+                    order,
+                    status,
+                )
+            reuse = (
+                previous is not None
+                and affected is not None
+                and str(action) in previous
+            )
             for d in self.powerdict(_vars):
 
                 # Check whether a subset of this variables were alread
@@ -238,26 +266,184 @@ class NuSMVEvidenceProcessor:
                 if any([h.items() <= d.items() for h in hits]):
                     continue
 
-                # Get valuation of each variable
-                # e.g., [[1,2,3], [True, False],...
-                a = [self.get_values(v) for v in d.values()]
+                # Take over the earlier evidence, if none of the
+                # variables is affected by the modification
+                names = frozenset(str(v) for v in d)
+                if reuse and len(d) and not any(str(v) in affected for v in d):
+                    combos = self.restore_evidence(previous[str(action)], d)
+                    for c in combos:
+                        status[self.stringify(c)] = True
+                else:
+                    image, inverse = (names, {})
+                    if stabilizer:
+                        image, inverse = symmetries.descend_names(
+                            stabilizer, names, partial(self.names_order, positions)
+                        )
 
-                # Construct the combinations
-                # e.g., [{x: 1, y: True}, {x:2, y=True},...}]
-                combos = [
-                    dict(zip(d.keys(), comb)) for comb in product(*a) if len(comb)
-                ]
+                    # The variables are the image of variables processed
+                    # earlier, hence their evidence is the image as well
+                    if image != names and image in found:
+                        evidence = [symmetries.apply(inverse, e) for e in found[image]]
+                        evidence.sort(key=order)
+                        combos = self.restore_evidence(evidence, d)
+                    else:
+                        combos = self.check_combos(check, action, d)
 
-                # Pass the combinations to the check-functions,
-                # which constructs the LTL-formula and queries the MC
+                found[names] = [dict(self.stringify(c)) for c in combos]
                 for c in combos:
-                    if check_func(action, c):
-                        hits.append(d)
-                        result.append(c)
+                    hits.append(d)
+                    result.append(c)
 
             results[str(action)] = result
+
+        # Map the evidence of the representatives onto the other actions
+        for action in actions:
+            rep, permutation = orbits.get(str(action), (str(action), {}))
+            if rep == str(action):
+                continue
+
+            evidence = [
+                symmetries.apply(permutation, dict(e))
+                for e in map(self.stringify, results[rep])
+            ]
+            evidence.sort(key=order)
+
+            results[str(action)] = [
+                self.restore_evidence([e], {v: t for v, t in _vars.items() if str(v) in e})[0]
+                for e in evidence
+            ]
+
         return results
 
+    @staticmethod
+    def stringify(
+        evidence: dict[pn.model.Identifier, pn.model.SimpleType]
+    ) -> frozenset[tuple[str, str]]:
+        """Converts evidence into a hashable form of strings."""
+        return frozenset((str(var), str(val)) for var, val in evidence.items())
+
+    @classmethod
+    def search_order(
+        cls, _vars: dict[pn.model.Identifier, pn.model.SimpleType]
+    ) -> Callable[[dict[str, str]], tuple]:
+        """Constructs a key function, which retrieves the position of
+        stringified evidence within the search order of
+        calc_set_compound(), i.e., by number of variables, the
+        variables' and finally the values' positions.
+
+        """
+        positions = {str(v): i for i, v in enumerate(_vars.keys())}
+        values = {
+            str(v): {str(val): i for i, val in enumerate(cls.get_values(t))}
+            for v, t in _vars.items()
+        }
+
+        def key(evidence: dict[str, str]) -> tuple:
+            ordered = sorted(evidence, key=positions.__getitem__)
+            return (
+                len(ordered),
+                tuple(positions[var] for var in ordered),
+                tuple(values[var][evidence[var]] for var in ordered),
+            )
+
+        return key
+
+    @staticmethod
+    def names_order(positions: dict[str, int], names: frozenset[str]) -> tuple:
+        """Retrieves the position of a set of variable names within the
+        search order of calc_set_compound(), i.e., by number of
+        variables and the variables' positions.
+
+        """
+        return len(names), tuple(sorted(positions[n] for n in names))
+
+    @classmethod
+    def check_symmetric(
+        cls,
+        check_func: Callable[
+            [pn.model.Identifier, dict[pn.model.Identifier, pn.model.SimpleType], str],
+            bool,
+        ],
+        descend: Callable,
+        generators: list[dict[str, str]],
+        order: Callable[[dict[str, str]], tuple],
+        status: dict[frozenset[tuple[str, str]], bool],
+        action: pn.model.Identifier,
+        var_val_mapping: dict[pn.model.Identifier, pn.model.SimpleType],
+    ) -> bool:
+        """Wraps the check-func in order to check only the combinations,
+        which cannot be moved to an earlier position in the search
+        order by any of the generators (see Symmetries.descend()).
+        Since calc_set_compound() proceeds in the search order, the
+        outcome for such an earlier combination is already known, when
+        it is encountered.
+
+        """
+        evidence = dict(cls.stringify(var_val_mapping))
+        first = descend(generators, evidence, order)
+
+        if first == evidence:
+            status[cls.stringify(var_val_mapping)] = check_func(action, var_val_mapping)
+            return status[cls.stringify(var_val_mapping)]
+
+        return status.get(frozenset(first.items()), False)
+
+    @classmethod
+    def check_combos(
+        cls,
+        check_func: Callable[
+            [pn.model.Identifier, dict[pn.model.Identifier, pn.model.SimpleType], str],
+            bool,
+        ],
+        action: pn.model.Identifier,
+        d: dict[pn.model.Identifier, pn.model.SimpleType],
+    ) -> list[dict[pn.model.Identifier, pn.model.SimpleType]]:
+        """Forms each possible combination of the values of the given
+        variables and checks it for the specified action.
+
+        Returns the list of combinations, for which the formula holds.
+        """
+        # Get valuation of each variable
+        # e.g., [[1,2,3], [True, False],...
+        a = [cls.get_values(v) for v in d.values()]
+
+        # Construct the combinations
+        # e.g., [{x: 1, y: True}, {x:2, y=True},...}]
+        combos = [dict(zip(d.keys(), comb)) for comb in product(*a) if len(comb)]
+
+        # Pass the combinations to the check-functions,
+        # which constructs the LTL-formula and queries the MC
+        return [c for c in combos if check_func(action, c)]
+
+    @classmethod
+    def restore_evidence(
+        cls,
+        evidence: list[dict[str, str]],
+        _vars: dict[pn.model.Identifier, pn.model.SimpleType],
+    ) -> list[dict[pn.model.Identifier, pn.model.SimpleType]]:
+        """Restores the stringified evidence of an earlier run, which
+        consists of exactly the given variables.
+
+        Returns a list of dicts mapping the variables to the
+        respective values of the model.
+        """
+        names = {str(v): v for v in _vars.keys()}
+        restored = []
+
+        for e in evidence:
+            if e.keys() != names.keys():
+                continue
+
+            values = {}
+            for name, val in e.items():
+                var = names[name]
+                values[var] = next(
+                    v for v in cls.get_values(_vars[var]) if str(v) == val
+                )
+            restored.append(values)
+
+        return restored
+
     @staticmethod
     def check_necessary_trace(
         action: pn.model.Identifier,
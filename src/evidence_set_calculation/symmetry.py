@@ -0,0 +1,396 @@
+#!/usr/bin/python3
+
+from __future__ import annotations
+
+__author__ = "jgru"
+__version__ = "0.0.1"
+
+import re
+from collections import Counter
+from collections.abc import Callable
+from itertools import combinations
+from typing import Union
+
+import pynusmv as pn
+
+from .sections import (
+    CONSTRAINT_SECTIONS,
+    IDENTIFIER,
+    MAPPING_SECTIONS,
+    PATH_SECTIONS,
+)
+
+# Matches enumerations like {a, b, c}, whose order is irrelevant
+ENUMERATION = re.compile(r"\{([^{}]*)\}")
+
+# Constants, which must never be renamed
+RESERVED = {"TRUE", "FALSE"}
+
+
+def rename(string: str, permutation: dict[str, str]) -> str:
+    """Renames each identifier in the string according to the
+    permutation.
+
+    """
+    return IDENTIFIER.sub(lambda m: permutation.get(m.group(0), m.group(0)), string)
+
+
+def canonicalize(string: str) -> str:
+    """Sorts the elements of each enumeration within the string."""
+    return ENUMERATION.sub(
+        lambda m: "{" + ", ".join(sorted(s.strip() for s in m.group(1).split(","))) + "}",
+        string,
+    )
+
+
+def model_elements(parsed_model) -> list[str]:
+    """Retrieves the stringified elements of all sections of the
+    parsed model.
+
+    """
+    elements = []
+
+    for section in MAPPING_SECTIONS:
+        for k, v in getattr(parsed_model, section).items():
+            elements.append(f"{section} {k} := {v}")
+
+    for section in CONSTRAINT_SECTIONS + PATH_SECTIONS:
+        for e in getattr(parsed_model, section):
+            elements.append(f"{section} {e}")
+
+    return elements
+
+
+def refine(elements: list[str], kinds: dict[str, str]) -> dict[str, int]:
+    """Partitions the symbols into classes, which are invariant under
+    renaming, so that a symmetry can only swap symbols of the same
+    class.
+
+    Starting from the kinds, the class of a symbol is refined by the
+    shapes of the elements it occurs in, i.e., the elements with each
+    symbol replaced by its class. This is repeated until the number of
+    classes no longer grows.
+
+    Returns a dict mapping each symbol to the id of its class.
+    """
+    ids = {k: i for i, k in enumerate(sorted(set(kinds.values())))}
+    classes = {s: ids[k] for s, k in kinds.items()}
+    occurrences = [
+        (e, {s for s in IDENTIFIER.findall(e) if s in kinds}) for e in elements
+    ]
+
+    while True:
+        shapes = {s: [] for s in kinds}
+
+        for e, symbols in occurrences:
+            for s in symbols:
+                shapes[s].append(
+                    canonicalize(
+                        IDENTIFIER.sub(
+                            lambda m: "<@>"
+                            if m.group(0) == s
+                            else f"<{classes[m.group(0)]}>"
+                            if m.group(0) in classes
+                            else m.group(0),
+                            e,
+                        )
+                    )
+                )
+
+        signatures = {s: (classes[s], tuple(sorted(shapes[s]))) for s in kinds}
+        ids = {sig: i for i, sig in enumerate(sorted(set(signatures.values())))}
+        refined = {s: ids[sig] for s, sig in signatures.items()}
+
+        if len(ids) == len(set(classes.values())):
+            return refined
+
+        classes = refined
+
+
+def compose(g: dict[str, str], p: dict[str, str]) -> dict[str, str]:
+    """Composes two permutations, i.e., applies p first and g
+    afterwards.
+
+    """
+    composed = {}
+
+    for s in p.keys() | g.keys():
+        t = g.get(p.get(s, s), p.get(s, s))
+        if s != t:
+            composed[s] = t
+
+    return composed
+
+
+class Symmetries:
+    """Houses the symmetries of a model, i.e., renamings of variables,
+    constants, defines and actions, which map the model onto itself.
+
+    Such a renaming maps the evidence of an action onto the evidence of
+    the renamed action. Hence, it suffices to check one representative
+    per orbit of variable/value-combinations and to calculate the
+    evidence of one action per orbit of actions.
+
+    """
+
+    def __init__(self, generators: list[dict[str, str]]) -> None:
+        """Initializes the symmetries by the permutations generating
+        them.
+
+        """
+        self.generators = generators
+
+    @classmethod
+    def detect(cls, parsed_model, action_name: str = "action") -> Symmetries:
+        """Detects symmetries of the parsed model.
+
+        Each pair of symbols of the same class (see refine()) serves
+        as seed, e.g., variables of the same type, which are assigned
+        and guarded alike. The seed is extended by swapping further
+        symbols of the same class occurring in the elements, which are
+        not mapped onto the model yet: first by swapping symbols with
+        the only other symbol of their class, otherwise greedily. Only
+        permutations mapping the model exactly onto itself (modulo
+        the order of enumerations and section elements) are kept.
+
+        *Note:* Values, which are not distinguished by any guard, are
+        not interchangeable per se, since assignments still tell them
+        apart. They are only considered equivalent, if the swap (and
+        its extension) is a symmetry of the whole model.
+
+        """
+        elements = model_elements(parsed_model)
+        original = Counter(canonicalize(e) for e in elements)
+
+        # Group the symbols by kind, only symbols of the same kind
+        # are swapped
+        kinds = {}
+        for v, t in parsed_model.VAR.items():
+            if str(v) == action_name:
+                for a in t.values:
+                    kinds[str(a)] = "action"
+                continue
+
+            kinds[str(v)] = canonicalize(str(t))
+            if isinstance(t, pn.model.Scalar):
+                for val in t.values:
+                    if IDENTIFIER.fullmatch(str(val)) and str(val) not in RESERVED:
+                        kinds.setdefault(str(val), "constant")
+
+        for d in parsed_model.DEFINE.keys():
+            kinds[str(d)] = "define"
+
+        classes = refine(elements, kinds)
+
+        def mismatch(permutation):
+            renamed = Counter(canonicalize(rename(e, permutation)) for e in elements)
+            return list((renamed - original).elements()) + list(
+                (original - renamed).elements()
+            )
+
+        def seeds():
+            for x, y in combinations(classes, 2):
+                if classes[x] == classes[y]:
+                    yield {x: y, y: x}
+
+        members = {}
+        for x, c in classes.items():
+            members.setdefault(c, []).append(x)
+
+        def diff_symbols(permutation, diff):
+            return {
+                s
+                for e in diff
+                for s in IDENTIFIER.findall(e)
+                if s in classes and s not in permutation
+            }
+
+        def close(seed):
+            # Swaps each mismatched symbol with the only other symbol
+            # of its class, like the copies of a mirrored component
+            permutation = dict(seed)
+            diff = mismatch(permutation)
+
+            while diff:
+                pairs = [
+                    members[classes[x]]
+                    for x in diff_symbols(permutation, diff)
+                    if len(members[classes[x]]) == 2
+                ]
+                pairs = [(x, y) for x, y in pairs if y not in permutation]
+                if not pairs:
+                    break
+
+                for x, y in pairs:
+                    permutation.update({x: y, y: x})
+                diff = mismatch(permutation)
+
+            return permutation, diff
+
+        def extend(seed):
+            # Swaps the pair of symbols reducing the mismatch the most.
+            # Coupled symbols might have to be swapped together, before
+            # the mismatch shrinks. Hence, steps keeping it are taken
+            # as well, at most once per symbol.
+            permutation = dict(seed)
+            diff = mismatch(permutation)
+
+            for _ in range(len(classes)):
+                if not diff:
+                    break
+
+                best = None
+                for x, y in combinations(sorted(diff_symbols(permutation, diff)), 2):
+                    if classes[x] != classes[y]:
+                        continue
+
+                    candidate = {**permutation, x: y, y: x}
+                    candidate_diff = mismatch(candidate)
+                    if best is None or len(candidate_diff) < len(best[1]):
+                        best = (candidate, candidate_diff)
+
+                if best is None or len(best[1]) > len(diff):
+                    break
+
+                permutation, diff = best
+
+            return permutation, diff
+
+        generators = []
+        for seed in seeds():
+            # Skip seeds, which are already covered
+            if any(all(g.get(s) == t for s, t in seed.items()) for g in generators):
+                continue
+
+            permutation, diff = close(seed)
+            if diff:
+                permutation, diff = extend(seed)
+
+            if not diff:
+                generators.append(permutation)
+
+        return cls(generators)
+
+    def __len__(self) -> int:
+        return len(self.generators)
+
+    def stabilizer(self, action: Union[pn.model.Identifier, str]) -> list[dict[str, str]]:
+        """Retrieves the generators, which leave the action unchanged."""
+        return [g for g in self.generators if g.get(str(action), str(action)) == str(action)]
+
+    def preserving(self, actions: list[Union[pn.model.Identifier, str]]) -> Symmetries:
+        """Retrieves the symmetries generated by the generators, which
+        map the given actions onto each other, i.e., preserve formulas
+        referring to all of them.
+
+        """
+        names = {str(a) for a in actions}
+
+        return Symmetries(
+            [g for g in self.generators if {g.get(a, a) for a in names} == names]
+        )
+
+    def action_orbits(
+        self, actions: list[Union[pn.model.Identifier, str]]
+    ) -> dict[str, tuple[str, dict[str, str]]]:
+        """Partitions the actions into orbits. The first action of
+        each orbit serves as its representative.
+
+        Returns a dict mapping each action to its representative and
+        the permutation mapping the representative onto the action.
+        """
+        names = [str(a) for a in actions]
+        orbits = {}
+
+        for rep in names:
+            if rep in orbits:
+                continue
+
+            orbits[rep] = (rep, {})
+            frontier = [(rep, {})]
+
+            while frontier:
+                action, permutation = frontier.pop()
+                for g in self.generators:
+                    image = g.get(action, action)
+                    if image in names and image not in orbits:
+                        composed = compose(g, permutation)
+                        orbits[image] = (rep, composed)
+                        frontier.append((image, composed))
+
+        return orbits
+
+    @staticmethod
+    def apply(permutation: dict[str, str], evidence: dict[str, str]) -> dict[str, str]:
+        """Applies the permutation to stringified evidence."""
+        return {
+            permutation.get(var, var): permutation.get(val, val)
+            for var, val in evidence.items()
+        }
+
+    @classmethod
+    def descend(
+        cls,
+        generators: list[dict[str, str]],
+        evidence: dict[str, str],
+        key: Callable[[dict[str, str]], tuple],
+    ) -> dict[str, str]:
+        """Maps stringified evidence onto an element of its orbit, which
+        none of the generators makes smaller with respect to key.
+
+        Unlike the minimum of the whole orbit, this costs a few passes
+        over the generators instead of enumerating up to n! images.
+        Elements of the same orbit might descend to different elements,
+        which merely leads to redundant checks, never to wrong ones.
+
+        """
+        current = evidence
+        current_key = key(evidence)
+        improved = True
+
+        while improved:
+            improved = False
+            for g in generators:
+                # Leaves the evidence unchanged
+                if not any(s in g for pair in current.items() for s in pair):
+                    continue
+
+                image = cls.apply(g, current)
+                image_key = key(image)
+                if image_key < current_key:
+                    current, current_key = image, image_key
+                    improved = True
+
+        return current
+
+    @staticmethod
+    def descend_names(
+        generators: list[dict[str, str]],
+        names: frozenset[str],
+        key: Callable[[frozenset[str]], tuple],
+    ) -> tuple[frozenset[str], dict[str, str]]:
+        """Like descend(), but for a set of variable names.
+
+        Returns the resulting set and the permutation mapping it back
+        onto the given names.
+        """
+        current = names
+        current_key = key(names)
+        inverse = {}
+        improved = True
+
+        while improved:
+            improved = False
+            for g in generators:
+                if not any(n in g for n in current):
+                    continue
+
+                image = frozenset(g.get(n, n) for n in current)
+                image_key = key(image)
+                if image_key < current_key:
+                    # Each generator is an involution, i.e., its own inverse
+                    current, current_key = image, image_key
+                    inverse = compose(inverse, g)
+                    improved = True
+
+        return current, inverse
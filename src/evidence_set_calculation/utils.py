@@ -1,20 +1,28 @@
 #!/usr/bin/python3
 
+from __future__ import annotations
+
 __author__ = "jgru"
 __version__ = "0.0.1"
 
+import abc
 import csv
 import io
+import json
+import sys
+from collections.abc import Iterator
 from enum import Enum
-from typing import Union
+from typing import BinaryIO, TextIO, Union
 
-from .smv_based_evidence import EvidenceType
+from .evidence_type import EvidenceType
 
 
 class EvidenceFormat(Enum):
     org = "org"
     csv = "csv"
     raw = "raw"
+    jsonl = "jsonl"
+    binary = "bin"
 
     def __str__(self) -> str:
         return str.__str__(self)
@@ -23,20 +31,29 @@ class EvidenceFormat(Enum):
 def output_evidence_set(
     es: dict[str, tuple[str, str]],
     _type: Union[EvidenceType, str],
-    output_format: Union[EvidenceFormat, str]
-):
-
+    output_format: Union[EvidenceFormat, str],
+    fp: Union[TextIO, BinaryIO] = None,
+) -> dict[str, int]:
+    """Writes the evidence sets in the requested format to fp. If fp
+    is not specified, stdout is used.
+
+    Returns a dict mapping each action to the number of written
+    elements of evidence (see EvidenceWriter.write_all()).
+    """
     assert _type != None, "Specify type!"
     _type = EvidenceType.normalize(_type)
 
-    if output_format == EvidenceFormat.csv.value:
-        output = construct_csv(es, _type)
-    elif output_format == EvidenceFormat.org.value:
-        output = construct_org_table(es, _type)
-    else:
-        output = es
+    output_format = EvidenceFormat(output_format)
+
+    if fp is None:
+        fp = sys.stdout.buffer if output_format == EvidenceFormat.binary else sys.stdout
+
+    if output_format in WRITERS:
+        return WRITERS[output_format](fp, _type).write_all(es)
 
-    print(output)
+    fp.write(f"{es}\n")
+
+    return {str(action): len(evidence) for action, evidence in es.items()}
 
 
 AND = r" & "
@@ -65,39 +82,20 @@ def evidence_to_formula(
 
     elem_connective = _and if _type == EvidenceType.necessary else _or
 
-    formula = ""
-    is_first = True
+    preds = []
 
     for e in evidence:
         pred = evidence_elem_to_formula(e, _type, use_alt_syms)
         if len(e.items()) > 1:
             pred = f"( {pred} )"
+        preds.append(pred)
 
-        if is_first:
-            is_first = False
-            formula += f"{pred}"
-        else:
-            formula += f"{elem_connective}{pred}"
-
-    return formula
+    return elem_connective.join(preds)
 
 
 def construct_csv(action_to_evidence: dict[str, tuple[str, str]], _type: EvidenceType):
     output = io.StringIO()
-    header = ["action", "evidence"]
-    w = csv.writer(
-        output,
-        delimiter=",",
-        quotechar='"',
-        quoting=csv.QUOTE_MINIMAL,
-        dialect="unix",
-    )
-
-    w.writerow(header)
-
-    for action in sorted(action_to_evidence):
-        formula = evidence_to_formula(action_to_evidence[action], _type)
-        w.writerow([action, formula])
+    CsvWriter(output, _type).write_all(action_to_evidence)
 
     return output.getvalue().strip("\r\n").strip("\r").strip("\n")
 
@@ -107,42 +105,343 @@ def construct_org_table(action_to_evidence, _type, title="Evidence"):
     org-mode-tables. This should _only_ be used with org-babel and
     `:results output table raw'
     """
-    org_table_string = ""
-    l = len(f"{max(action_to_evidence.keys(), key=len)} of {title} ")
-
-    row_sep = f"|{l * '--'}|\n"
-    col_heading_1 = "Desc"
-    col_heading_2 = "Assignments"
-    org_table_string = (
-        f"{row_sep}| "
-        + f"{col_heading_1} {(l//2- len(col_heading_1)) * ' ' }|"
-        + f" {col_heading_2} {(l//2- len(col_heading_2)) * ' '}\n"
-    )
-
-    # Construct entries for each action
-    for action in sorted(action_to_evidence.keys()):
-        h = f"{title} of {action}"
-        h += (l - len(h)) * " "
-        org_table_string += row_sep
+    output = io.StringIO()
+    OrgWriter(output, _type, title=title).write_all(action_to_evidence)
+
+    return output.getvalue()
+
+
+class EvidenceWriter(abc.ABC):
+    """Base class of the writers, which append evidence sets to a
+    file-like object.
+
+    The output is collected in an internal buffer and handed to the
+    file-like object in chunks of (at least) buffer_size, so that
+    millions of rows do not result in millions of calls to write().
+
+    Usage: Call begin() with the actions to write, write() for each
+    action and finally close(). write_all() does this at once.
+
+    """
+
+    # Joins the buffered chunks (str for text, bytes for binary formats)
+    EMPTY = ""
+
+    def __init__(
+        self,
+        fp: Union[TextIO, BinaryIO],
+        _type: Union[EvidenceType, str],
+        buffer_size: int = io.DEFAULT_BUFFER_SIZE * 8,
+    ) -> None:
+        self.fp = fp
+        self._type = EvidenceType.normalize(_type) if _type else None
+        self.buffer_size = buffer_size
+        self.chunks = []
+        self.size = 0
+        self.is_closed = False
+
+    def __enter__(self) -> EvidenceWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @staticmethod
+    def stringify(evidence: list[dict]) -> list[dict[str, str]]:
+        """Converts evidence into dicts of strings."""
+        return [{str(var): str(val) for var, val in e.items()} for e in evidence]
+
+    def emit(self, data: Union[str, bytes]) -> None:
+        """Appends data to the buffer and flushes it, if full."""
+        self.chunks.append(data)
+        self.size += len(data)
+
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hands the buffered data to the file-like object."""
+        if self.chunks:
+            self.fp.write(self.EMPTY.join(self.chunks))
+            self.chunks = []
+            self.size = 0
+
+    def begin(self, actions: list[str]) -> None:
+        """Writes the header, if the format requires one."""
+        pass
+
+    def write(self, action: str, evidence: list[dict]) -> int:
+        """Appends the evidence of a single action.
+
+        Returns the number of written elements of evidence.
+        """
+        self.write_rows(str(action), evidence)
+        return len(evidence)
+
+    @abc.abstractmethod
+    def write_rows(self, action: str, evidence: list[dict]) -> None:
+        """Formats the evidence of a single action and emits it."""
+
+    def end(self) -> None:
+        """Writes the footer, if the format requires one."""
+        pass
+
+    def close(self) -> None:
+        """Writes the footer and flushes the buffer. The file-like
+        object itself stays open.
+
+        """
+        if self.is_closed:
+            return
+
+        self.end()
+        self.flush()
+
+        if hasattr(self.fp, "flush"):
+            self.fp.flush()
+
+        self.is_closed = True
+
+    def write_all(self, action_to_evidence: dict) -> dict[str, int]:
+        """Writes the evidence sets of all actions sorted by action.
+
+        Returns a dict mapping each action to the number of written
+        elements of evidence.
+        """
+        actions = sorted(action_to_evidence, key=str)
+        self.begin([str(a) for a in actions])
+
+        written = {str(a): self.write(a, action_to_evidence[a]) for a in actions}
+
+        self.close()
+
+        return written
+
+
+class CsvSink:
+    """Adapter, which allows csv.writer to write into an EvidenceWriter."""
+
+    def __init__(self, writer: EvidenceWriter) -> None:
+        self.write = writer.emit
+
+
+class CsvWriter(EvidenceWriter):
+    """Writes one row per action, holding the evidence as formula."""
+
+    def __init__(self, fp: TextIO, _type: Union[EvidenceType, str], **kwargs) -> None:
+        super().__init__(fp, _type, **kwargs)
+        self.csv = csv.writer(
+            CsvSink(self),
+            delimiter=",",
+            quotechar='"',
+            quoting=csv.QUOTE_MINIMAL,
+            dialect="unix",
+        )
+
+    def begin(self, actions: list[str]) -> None:
+        self.csv.writerow(["action", "evidence"])
+
+    def write_rows(self, action: str, evidence: list[dict]) -> None:
+        self.csv.writerow([action, evidence_to_formula(evidence, self._type)])
+
+
+class OrgWriter(EvidenceWriter):
+    """Writes the evidence sets as org-mode-table. If no type is
+    given, the raw variable/value assignments are listed instead of
+    the formula.
+
+    """
+
+    def __init__(
+        self, fp: TextIO, _type: Union[EvidenceType, str], title="Evidence", **kwargs
+    ) -> None:
+        super().__init__(fp, _type, **kwargs)
+        self.title = title
+
+    def begin(self, actions: list[str]) -> None:
+        self.width = len(f"{max(actions, key=len, default='')} of {self.title} ")
+        self.row_sep = f"|{self.width * '--'}|\n"
+
+        col_heading_1 = "Desc"
+        col_heading_2 = "Assignments"
+        self.emit(
+            f"{self.row_sep}| "
+            + f"{col_heading_1} {(self.width//2- len(col_heading_1)) * ' ' }|"
+            + f" {col_heading_2} {(self.width//2- len(col_heading_2)) * ' '}\n"
+        )
+
+    def write_rows(self, action: str, evidence: list[dict]) -> None:
+        h = f"{self.title} of {action}"
+        h += (self.width - len(h)) * " "
+        self.emit(self.row_sep)
 
         # Raw variable/value assignments
-        if not _type:
-            values = action_to_evidence[action]
-            if not values:
-                org_table_string += f"| {h:>5} | \n"
-            for value in values:
-                org_table_string += f"| {h:>5} | {value} |\n"
-                h = " " * l
+        if not self._type:
+            if not evidence:
+                self.emit(f"| {h:>5} | \n")
+            for value in evidence:
+                self.emit(f"| {h:>5} | {value} |\n")
+                h = " " * self.width
         # Formula
         else:
-            org_table_string += (
+            self.emit(
                 f"| {h:>5} |"
-                + evidence_to_formula(
-                    action_to_evidence[action], _type, use_alt_syms=True
-                )
+                + evidence_to_formula(evidence, self._type, use_alt_syms=True)
                 + "|\n"
             )
 
-    org_table_string += row_sep
+    def end(self) -> None:
+        self.emit(self.row_sep)
+
+
+class JsonlWriter(EvidenceWriter):
+    """Writes one JSON object per line and element of evidence, e.g.,
+    {"action": "a0", "evidence": {"x": "TRUE", "y": "FALSE"}}
+
+    An action without evidence is written as a single object with
+    "evidence": null, so that it is not lost.
+
+    """
+
+    def write_rows(self, action: str, evidence: list[dict]) -> None:
+        if not evidence:
+            self.emit(json.dumps({"action": action, "evidence": None}) + "\n")
+
+        for e in self.stringify(evidence):
+            self.emit(json.dumps({"action": action, "evidence": e}) + "\n")
+
+
+# Layout of the binary format: MAGIC, the type of evidence as string
+# and a sequence of records. A STRING_RECORD adds a string to the
+# table of interned strings (actions, variables and values), a
+# ROW_RECORD references the table via ids to specify an element of
+# evidence of an action. A ROW_RECORD without any pairs denotes an
+# action without evidence. Strings are prefixed by their length, all
+# integers are encoded as varints.
+MAGIC = b"EVS\x01"
+STRING_RECORD = 1
+ROW_RECORD = 2
+
+
+def encode_varint(n: int) -> bytes:
+    """Encodes a non-negative integer as LEB128-varint."""
+    out = bytearray()
+
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def decode_varint(fp: BinaryIO) -> int:
+    """Reads a LEB128-varint from the file-like object."""
+    n = 0
+    shift = 0
+
+    while True:
+        byte = fp.read(1)
+        if not byte:
+            raise EOFError("Truncated varint")
+        n |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            return n
+        shift += 7
+
+
+def encode_string(string: str) -> bytes:
+    data = string.encode("utf-8")
+    return encode_varint(len(data)) + data
+
+
+def decode_string(fp: BinaryIO) -> str:
+    n = decode_varint(fp)
+    return fp.read(n).decode("utf-8")
+
+
+class BinaryWriter(EvidenceWriter):
+    """Writes the evidence sets in a compact binary format, in which
+    each action, variable and value is stored only once (see MAGIC).
+    Use read_binary() to read it.
+
+    """
+
+    EMPTY = b""
+
+    def __init__(self, fp: BinaryIO, _type: Union[EvidenceType, str], **kwargs) -> None:
+        super().__init__(fp, _type, **kwargs)
+        self.strings = {}
+
+    def intern(self, string: str) -> int:
+        """Retrieves the id of the string and adds it to the table, if
+        it is not yet contained.
+
+        """
+        if string not in self.strings:
+            self.strings[string] = len(self.strings)
+            self.emit(bytes([STRING_RECORD]) + encode_string(string))
+
+        return self.strings[string]
+
+    def begin(self, actions: list[str]) -> None:
+        self.emit(MAGIC + encode_string(self._type.value))
+
+    def write_rows(self, action: str, evidence: list[dict]) -> None:
+        action_id = self.intern(action)
+
+        if not evidence:
+            self.emit(
+                bytes([ROW_RECORD]) + encode_varint(action_id) + encode_varint(0)
+            )
+
+        for e in self.stringify(evidence):
+            ids = [(self.intern(var), self.intern(val)) for var, val in e.items()]
+            self.emit(
+                bytes([ROW_RECORD])
+                + encode_varint(action_id)
+                + encode_varint(len(ids))
+                + b"".join(encode_varint(v) + encode_varint(x) for v, x in ids)
+            )
+
 
-    return org_table_string
+def read_binary(fp: BinaryIO) -> tuple[EvidenceType, Iterator[tuple[str, dict[str, str]]]]:
+    """Reads evidence sets written by BinaryWriter.
+
+    Returns the type of evidence and an iterator over tuples of
+    action and evidence. For an action without evidence, the tuple
+    holds None instead.
+    """
+    if fp.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not an evidence set in binary format")
+
+    _type = EvidenceType.normalize(decode_string(fp))
+
+    def rows():
+        strings = []
+
+        while tag := fp.read(1):
+            if tag[0] == STRING_RECORD:
+                strings.append(decode_string(fp))
+            elif tag[0] == ROW_RECORD:
+                action = strings[decode_varint(fp)]
+                n = decode_varint(fp)
+                evidence = {
+                    strings[decode_varint(fp)]: strings[decode_varint(fp)]
+                    for _ in range(n)
+                }
+                yield action, evidence if n else None
+            else:
+                raise ValueError(f"Unknown record {tag[0]}")
+
+    return _type, rows()
+
+
+WRITERS = {
+    EvidenceFormat.csv: CsvWriter,
+    EvidenceFormat.org: OrgWriter,
+    EvidenceFormat.jsonl: JsonlWriter,
+    EvidenceFormat.binary: BinaryWriter,
+}
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+pn = pytest.importorskip("pynusmv")
+
+from evidence_set_calculation.incremental import affected_by_changes
+
+MODEL = os.path.join(
+    os.path.dirname(__file__), os.pardir, "examples", "models", "lst-4.smv"
+)
+
+
+def parse(model_data):
+    return pn.parser.parseAllString(pn.parser.module, model_data)
+
+
+@pytest.fixture
+def model_data():
+    with open(MODEL, "r") as f:
+        return f.read()
+
+
+def test_unchanged_model(model_data):
+    assert affected_by_changes(parse(model_data), parse(model_data)) == (set(), set())
+
+
+def test_guard_edit_affects_only_its_action(model_data):
+    edited = model_data.replace(
+        "next(action) = a2 -> b = TRUE", "next(action) = a2 -> c = TRUE"
+    )
+
+    assert affected_by_changes(parse(model_data), parse(edited)) == (
+        {"c", "d"},
+        {"a2"},
+    )
+
+
+def test_case_edit_affects_only_its_variable(model_data):
+    edited = model_data.replace("next(action) = a3: TRUE;", "next(action) = a3: FALSE;")
+
+    assert affected_by_changes(parse(model_data), parse(edited)) == ({"d"}, set())
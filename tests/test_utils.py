@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+
+from evidence_set_calculation.evidence_type import EvidenceType
+from evidence_set_calculation.utils import (
+    EvidenceFormat,
+    output_evidence_set,
+    read_binary,
+)
+
+EVIDENCE = {
+    "a1": [{"x": "TRUE"}, {"x": "FALSE", "y": "s1"}],
+    "a0": [],
+    "a2": [{"y": "s0"}],
+}
+
+
+def test_csv_round_trip():
+    f = io.StringIO()
+    output_evidence_set(EVIDENCE, EvidenceType.sufficient, EvidenceFormat.csv, f)
+    f.seek(0)
+
+    assert list(csv.reader(f)) == [
+        ["action", "evidence"],
+        ["a0", ""],
+        ["a1", "x=TRUE | ( x=FALSE & y=s1 )"],
+        ["a2", "y=s0"],
+    ]
+
+
+def test_jsonl_round_trip():
+    f = io.StringIO()
+    written = output_evidence_set(
+        EVIDENCE, EvidenceType.sufficient, EvidenceFormat.jsonl, f
+    )
+    f.seek(0)
+
+    assert written == {"a0": 0, "a1": 2, "a2": 1}
+
+    read = {}
+    for line in f:
+        row = json.loads(line)
+        evidence = read.setdefault(row["action"], [])
+        if row["evidence"] is not None:
+            evidence.append(row["evidence"])
+
+    assert read == EVIDENCE
+
+
+def test_binary_round_trip():
+    f = io.BytesIO()
+    output_evidence_set(EVIDENCE, EvidenceType.necessary, EvidenceFormat.binary, f)
+    f.seek(0)
+
+    _type, rows = read_binary(f)
+    read = {}
+    for action, e in rows:
+        evidence = read.setdefault(action, [])
+        if e is not None:
+            evidence.append(e)
+
+    assert _type == EvidenceType.necessary
+    assert read == EVIDENCE